@@ -1,6 +1,45 @@
+from django import forms
 from django.contrib import admin
+from django.db import transaction
+from django.urls import reverse
 from django.utils.html import format_html
-from .models import Organization, Payment, BalanceLog
+from .cache import invalidate_balances
+from .models import Organization, Payment, BalanceLog, from_kopecks, to_kopecks
+from .paginators import FasterAdminPaginator
+
+
+# Суммы в админке вводятся в рублях, а в столбец модели пишутся копейки.
+# kopecks_fields: поле формы -> столбец модели в копейках.
+class RoublesForm(forms.ModelForm):
+    kopecks_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, column in self.kopecks_fields.items():
+            self.initial.setdefault(name, from_kopecks(getattr(self.instance, column)))
+
+    def save(self, commit=True):
+        for name, column in self.kopecks_fields.items():
+            setattr(self.instance, column, to_kopecks(self.cleaned_data[name]))
+        return super().save(commit)
+
+
+class OrganizationAdminForm(RoublesForm):
+    balance = forms.DecimalField(max_digits=15, decimal_places=2, label="Баланс")
+    kopecks_fields = {"balance": "balance_kopecks"}
+
+    class Meta:
+        model = Organization
+        exclude = ("balance_kopecks",)
+
+
+class PaymentAdminForm(RoublesForm):
+    amount = forms.DecimalField(max_digits=15, decimal_places=2, label="Сумма платежа")
+    kopecks_fields = {"amount": "amount_kopecks"}
+
+    class Meta:
+        model = Payment
+        exclude = ("amount_kopecks",)
 
 
 class BalanceLogInline(admin.TabularInline):
@@ -9,18 +48,26 @@ class BalanceLogInline(admin.TabularInline):
     readonly_fields = ("amount_changed", "timestamp", "payment_link")
     fields = ("payment_link", "amount_changed", "timestamp")
     can_delete = False
+    _PAYMENT_URL = "admin:payments_payment_change"
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("payment", "organization")
 
     def payment_link(self, obj):
-        if obj.payment_id:
-            url = f"/admin/{obj.payment._meta.app_label}/{obj.payment._meta.model_name}/{obj.payment_id}/change/"
-            return format_html("<a href='{}'>{}</a>", url, obj.payment.document_number)
-        return "-"
+        if not obj.payment_id:
+            return "-"
+        return format_html(
+            "<a href='{}'>{}</a>",
+            reverse(self._PAYMENT_URL, args=[obj.payment_id]),
+            obj.payment.document_number,
+        )
 
     payment_link.short_description = "Платеж"
 
 
 @admin.register(Organization)
 class OrganizationAdmin(admin.ModelAdmin):
+    form = OrganizationAdminForm
     list_display = (
         "inn",
         "formatted_balance",
@@ -52,14 +99,36 @@ class OrganizationAdmin(admin.ModelAdmin):
 
     actions = ["reset_balances"]
 
+    def get_readonly_fields(self, request, obj=None):
+        # На ИНН ссылаются платежи и логи, поэтому после создания он не меняется
+        if obj is not None:
+            return self.readonly_fields + ("inn",)
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        transaction.on_commit(lambda: invalidate_balances([obj.inn]))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(lambda: invalidate_balances([obj.inn]))
+
+    def delete_queryset(self, request, queryset):
+        inns = list(queryset.values_list("inn", flat=True))
+        super().delete_queryset(request, queryset)
+        transaction.on_commit(lambda: invalidate_balances(inns))
+
     @admin.action(description="Сбросить балансы всех выбранных организаций в 0")
     def reset_balances(self, request, queryset):
-        updated = queryset.update(balance=0)
+        inns = list(queryset.values_list("inn", flat=True))
+        updated = queryset.update(balance_kopecks=0)
+        transaction.on_commit(lambda: invalidate_balances(inns))
         self.message_user(request, f"Сброшено балансов для {updated} организаций.")
 
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
+    form = PaymentAdminForm
     list_display = (
         "operation_id",
         "amount",
@@ -72,8 +141,12 @@ class PaymentAdmin(admin.ModelAdmin):
     search_fields = ("operation_id", "document_number", "payer__inn")
     date_hierarchy = "document_date"
     ordering = ("-document_date",)
+    list_select_related = ("payer",)
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
     readonly_fields = ("created_at",)
     inlines = [BalanceLogInline]
+    _PAYER_URL = "admin:payments_organization_change"
 
     fieldsets = (
         (
@@ -98,11 +171,20 @@ class PaymentAdmin(admin.ModelAdmin):
     )
 
     def payer_link(self, obj):
-        url = f"/admin/{obj.payer._meta.app_label}/{obj.payer._meta.model_name}/{obj.payer_id}/change/"
-        return format_html("<a href='{}'>{}</a>", url, obj.payer.inn)
+        return format_html(
+            "<a href='{}'>{}</a>",
+            reverse(self._PAYER_URL, args=[obj.payer.pk]),
+            obj.payer.inn,
+        )
 
     payer_link.short_description = "Плательщик"
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Новый платёж начисляет триггер, поэтому закэшированный баланс устарел
+        if not change:
+            transaction.on_commit(lambda: invalidate_balances([obj.payer_id]))
+
 
 @admin.register(BalanceLog)
 class BalanceLogAdmin(admin.ModelAdmin):
@@ -116,21 +198,33 @@ class BalanceLogAdmin(admin.ModelAdmin):
     search_fields = ("organization__inn", "payment__document_number")
     date_hierarchy = "timestamp"
     ordering = ("-timestamp",)
+    list_select_related = ("organization", "payment")
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
     readonly_fields = (
         "organization",
         "payment",
         "amount_changed",
         "timestamp",
     )
+    exclude = ("amount_changed_kopecks",)
+    _ORGANIZATION_URL = "admin:payments_organization_change"
+    _PAYMENT_URL = "admin:payments_payment_change"
 
     def organization_link(self, obj):
-        url = f"/admin/{obj.organization._meta.app_label}/{obj.organization._meta.model_name}/{obj.organization_id}/change/"
-        return format_html("<a href='{}'>{}</a>", url, obj.organization.inn)
+        return format_html(
+            "<a href='{}'>{}</a>",
+            reverse(self._ORGANIZATION_URL, args=[obj.organization.pk]),
+            obj.organization.inn,
+        )
 
     organization_link.short_description = "Организация"
 
     def payment_link(self, obj):
-        url = f"/admin/{obj.payment._meta.app_label}/{obj.payment._meta.model_name}/{obj.payment_id}/change/"
-        return format_html("<a href='{}'>{}</a>", url, obj.payment.document_number)
+        return format_html(
+            "<a href='{}'>{}</a>",
+            reverse(self._PAYMENT_URL, args=[obj.payment_id]),
+            obj.payment.document_number,
+        )
 
     payment_link.short_description = "Платеж"
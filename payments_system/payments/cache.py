@@ -0,0 +1,37 @@
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Время жизни закэшированного ответа с балансом (секунды)
+BALANCE_CACHE_TTL = 300
+
+
+def balance_cache_key(inn):
+    return f"bal:{inn}"
+
+
+# Вызывается после коммита: сбой кэша не должен превращать уже сохранённые
+# изменения в ошибку. Устаревший баланс в худшем случае живёт BALANCE_CACHE_TTL.
+def invalidate_balances(inns):
+    try:
+        cache.delete_many([balance_cache_key(inn) for inn in inns])
+    except Exception as e:
+        logger.warning(f"Не удалось сбросить кэш балансов {list(inns)}: {str(e)}")
+
+
+# Кэш баланса только ускоряет чтение: при его недоступности ответ строится из БД
+def get_cached_balance(inn):
+    try:
+        return cache.get(balance_cache_key(inn))
+    except Exception as e:
+        logger.warning(f"Кэш балансов недоступен: {str(e)}")
+        return None
+
+
+def cache_balance(inn, data):
+    try:
+        cache.set(balance_cache_key(inn), data, BALANCE_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Кэш балансов недоступен: {str(e)}")
@@ -0,0 +1,53 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from payments.services import INBOX_BATCH_SIZE, process_inbox_batch
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Проводит платежи из входящей очереди вебхуков."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=INBOX_BATCH_SIZE,
+            help="Сколько вебхуков обрабатывать за одну транзакцию.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Пауза в секундах, когда очередь пуста.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Разобрать очередь и завершиться, не дожидаясь новых вебхуков.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                processed = process_inbox_batch(options["batch_size"])
+            except Exception as e:
+                if options["once"]:
+                    raise
+                # Сбой пакета (дедлок, обрыв соединения) не останавливает
+                # воркер: строки остались необработанными и будут взяты снова
+                logger.exception(f"Ошибка при обработке очереди вебхуков: {str(e)}")
+                self.stderr.write(f"Ошибка при обработке очереди вебхуков: {e}")
+                close_old_connections()
+                time.sleep(options["interval"])
+                continue
+            if processed:
+                self.stdout.write(f"Обработано вебхуков: {processed}")
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,179 @@
+# Generated by Django 4.2.17 on 2026-10-14 08:24
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Organization",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "inn",
+                    models.CharField(
+                        db_index=True,
+                        help_text="Идентификационный Номер Налогоплательщика организации.",
+                        max_length=12,
+                        unique=True,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                message="ИНН должен состоять из 10 или 12 цифр.",
+                                regex="^\\d{10}$|^\\d{12}$",
+                            )
+                        ],
+                        verbose_name="ИНН",
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0.0,
+                        help_text="Текущий баланс организации.",
+                        max_digits=15,
+                        verbose_name="Баланс",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+                ),
+            ],
+            options={
+                "verbose_name": "Организация",
+                "verbose_name_plural": "Организации",
+                "db_table": "organizations",
+                "ordering": ["inn"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Payment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "operation_id",
+                    models.UUIDField(
+                        db_index=True,
+                        default=uuid.uuid4,
+                        unique=True,
+                        verbose_name="Идентификатор операции",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=15, verbose_name="Сумма платежа"
+                    ),
+                ),
+                (
+                    "document_number",
+                    models.CharField(
+                        max_length=50, unique=True, verbose_name="Номер документа"
+                    ),
+                ),
+                ("document_date", models.DateTimeField(verbose_name="Дата документа")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "payer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payments",
+                        to="payments.organization",
+                        verbose_name="Плательщик",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Платеж",
+                "verbose_name_plural": "Платежи",
+                "db_table": "payments",
+                "ordering": ["-document_date"],
+            },
+        ),
+        migrations.CreateModel(
+            name="BalanceLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "amount_changed",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=15, verbose_name="Сумма изменения"
+                    ),
+                ),
+                (
+                    "timestamp",
+                    models.DateTimeField(
+                        auto_now_add=True, db_index=True, verbose_name="Время изменения"
+                    ),
+                ),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="balance_logs",
+                        to="payments.organization",
+                        verbose_name="Организация",
+                    ),
+                ),
+                (
+                    "payment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="balance_logs",
+                        to="payments.payment",
+                        verbose_name="Платеж",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Лог изменения баланса",
+                "verbose_name_plural": "Логи изменения баланса",
+                "db_table": "balance_logs",
+                "ordering": ["-timestamp"],
+            },
+        ),
+    ]
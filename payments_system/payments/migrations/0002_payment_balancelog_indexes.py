@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-14 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="balancelog",
+            index=models.Index(
+                fields=["organization", "-timestamp"], name="blog_org_ts_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["-document_date"], name="pay_docdate_desc_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["payer", "-document_date"], name="pay_payer_docdate_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.17 on 2026-10-14 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0002_payment_balancelog_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WebhookInbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "operation_id",
+                    models.UUIDField(
+                        unique=True, verbose_name="Идентификатор операции"
+                    ),
+                ),
+                ("payload", models.JSONField(verbose_name="Тело вебхука")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата получения"
+                    ),
+                ),
+                (
+                    "processed_at",
+                    models.DateTimeField(
+                        blank=True,
+                        db_index=True,
+                        null=True,
+                        verbose_name="Дата обработки",
+                    ),
+                ),
+                (
+                    "error",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        max_length=255,
+                        verbose_name="Ошибка обработки",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Входящий вебхук",
+                "verbose_name_plural": "Входящие вебхуки",
+                "db_table": "webhook_inbox",
+                "ordering": ["created_at"],
+            },
+        ),
+    ]
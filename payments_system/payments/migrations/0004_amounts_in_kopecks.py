@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Cast, Round
+
+
+def to_kopecks(apps, schema_editor):
+    Organization = apps.get_model("payments", "Organization")
+    Payment = apps.get_model("payments", "Payment")
+    BalanceLog = apps.get_model("payments", "BalanceLog")
+    Organization.objects.update(
+        balance_kopecks=Cast(Round(F("balance") * 100), models.BigIntegerField())
+    )
+    Payment.objects.update(
+        amount_kopecks=Cast(Round(F("amount") * 100), models.BigIntegerField())
+    )
+    BalanceLog.objects.update(
+        amount_changed_kopecks=Cast(
+            Round(F("amount_changed") * 100), models.BigIntegerField()
+        )
+    )
+
+
+def from_kopecks(apps, schema_editor):
+    Organization = apps.get_model("payments", "Organization")
+    Payment = apps.get_model("payments", "Payment")
+    BalanceLog = apps.get_model("payments", "BalanceLog")
+    kopeck = Value(
+        Decimal("0.01"),
+        output_field=models.DecimalField(max_digits=3, decimal_places=2),
+    )
+    Organization.objects.update(balance=F("balance_kopecks") * kopeck)
+    Payment.objects.update(amount=F("amount_kopecks") * kopeck)
+    BalanceLog.objects.update(amount_changed=F("amount_changed_kopecks") * kopeck)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0003_webhookinbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organization",
+            name="balance_kopecks",
+            field=models.BigIntegerField(
+                default=0,
+                help_text="Текущий баланс организации в копейках.",
+                verbose_name="Баланс, коп.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="amount_kopecks",
+            field=models.BigIntegerField(default=0, verbose_name="Сумма платежа, коп."),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="balancelog",
+            name="amount_changed_kopecks",
+            field=models.BigIntegerField(
+                default=0, verbose_name="Сумма изменения, коп."
+            ),
+            preserve_default=False,
+        ),
+        # При откате столбцы возвращаются пустыми и заполняются from_kopecks
+        migrations.AlterField(
+            model_name="payment",
+            name="amount",
+            field=models.DecimalField(
+                decimal_places=2,
+                max_digits=15,
+                null=True,
+                verbose_name="Сумма платежа",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="balancelog",
+            name="amount_changed",
+            field=models.DecimalField(
+                decimal_places=2,
+                max_digits=15,
+                null=True,
+                verbose_name="Сумма изменения",
+            ),
+        ),
+        migrations.RunPython(to_kopecks, from_kopecks),
+        migrations.RemoveField(
+            model_name="organization",
+            name="balance",
+        ),
+        migrations.RemoveField(
+            model_name="payment",
+            name="amount",
+        ),
+        migrations.RemoveField(
+            model_name="balancelog",
+            name="amount_changed",
+        ),
+    ]
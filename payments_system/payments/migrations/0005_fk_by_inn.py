@@ -0,0 +1,157 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def to_inn(apps, schema_editor):
+    Organization = apps.get_model("payments", "Organization")
+    Payment = apps.get_model("payments", "Payment")
+    BalanceLog = apps.get_model("payments", "BalanceLog")
+    Payment.objects.update(
+        payer_by_inn=Subquery(
+            Organization.objects.filter(pk=OuterRef("payer")).values("inn")[:1]
+        )
+    )
+    BalanceLog.objects.update(
+        organization_by_inn=Subquery(
+            Organization.objects.filter(pk=OuterRef("organization")).values("inn")[:1]
+        )
+    )
+
+
+def to_pk(apps, schema_editor):
+    Organization = apps.get_model("payments", "Organization")
+    Payment = apps.get_model("payments", "Payment")
+    BalanceLog = apps.get_model("payments", "BalanceLog")
+    Payment.objects.update(
+        payer=Subquery(
+            Organization.objects.filter(inn=OuterRef("payer_by_inn")).values("pk")[:1]
+        )
+    )
+    BalanceLog.objects.update(
+        organization=Subquery(
+            Organization.objects.filter(inn=OuterRef("organization_by_inn")).values(
+                "pk"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0004_amounts_in_kopecks"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="payment",
+            name="pay_payer_docdate_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="balancelog",
+            name="blog_org_ts_idx",
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="payer_by_inn",
+            field=models.ForeignKey(
+                db_column="payer_inn",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="payments.organization",
+                to_field="inn",
+            ),
+        ),
+        migrations.AddField(
+            model_name="balancelog",
+            name="organization_by_inn",
+            field=models.ForeignKey(
+                db_column="organization_inn",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="payments.organization",
+                to_field="inn",
+            ),
+        ),
+        # При откате старые столбцы возвращаются пустыми и заполняются to_pk
+        migrations.AlterField(
+            model_name="payment",
+            name="payer",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to="payments.organization",
+                verbose_name="Плательщик",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="balancelog",
+            name="organization",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="balance_logs",
+                to="payments.organization",
+                verbose_name="Организация",
+            ),
+        ),
+        migrations.RunPython(to_inn, to_pk),
+        migrations.RemoveField(
+            model_name="payment",
+            name="payer",
+        ),
+        migrations.RemoveField(
+            model_name="balancelog",
+            name="organization",
+        ),
+        migrations.RenameField(
+            model_name="payment",
+            old_name="payer_by_inn",
+            new_name="payer",
+        ),
+        migrations.RenameField(
+            model_name="balancelog",
+            old_name="organization_by_inn",
+            new_name="organization",
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="payer",
+            field=models.ForeignKey(
+                db_column="payer_inn",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="payments",
+                to="payments.organization",
+                to_field="inn",
+                verbose_name="Плательщик",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="balancelog",
+            name="organization",
+            field=models.ForeignKey(
+                db_column="organization_inn",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="balance_logs",
+                to="payments.organization",
+                to_field="inn",
+                verbose_name="Организация",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["payer", "-document_date"], name="pay_payer_docdate_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="balancelog",
+            index=models.Index(
+                fields=["organization", "-timestamp"], name="blog_org_ts_idx"
+            ),
+        ),
+    ]
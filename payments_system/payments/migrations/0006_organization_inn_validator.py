@@ -0,0 +1,26 @@
+# Generated by Django 4.2.17 on 2026-10-14 08:32
+
+from django.db import migrations, models
+import payments.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0005_fk_by_inn"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="organization",
+            name="inn",
+            field=models.CharField(
+                db_index=True,
+                help_text="Идентификационный Номер Налогоплательщика организации.",
+                max_length=12,
+                unique=True,
+                validators=[payments.models.validate_inn],
+                verbose_name="ИНН",
+            ),
+        ),
+    ]
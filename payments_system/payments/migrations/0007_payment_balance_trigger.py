@@ -0,0 +1,60 @@
+from django.db import NotSupportedError, migrations
+
+# Каждая вставка в payments сама начисляет сумму на баланс организации
+# и пишет строку в balance_logs — в той же транзакции, без отдельных запросов.
+# Кэш балансов (bal:<inn>) триггер не сбрасывает — это делает вставляющий код.
+CREATE_TRIGGER = {
+    "mysql": """
+        CREATE TRIGGER payments_after_insert AFTER INSERT ON payments
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO balance_logs
+                (organization_inn, payment_id, amount_changed_kopecks, timestamp)
+            VALUES (NEW.payer_inn, NEW.id, NEW.amount_kopecks, UTC_TIMESTAMP(6));
+            UPDATE organizations
+            SET balance_kopecks = balance_kopecks + NEW.amount_kopecks,
+                updated_at = UTC_TIMESTAMP(6)
+            WHERE inn = NEW.payer_inn;
+        END
+    """,
+    "sqlite": """
+        CREATE TRIGGER payments_after_insert AFTER INSERT ON payments
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO balance_logs
+                (organization_inn, payment_id, amount_changed_kopecks, timestamp)
+            VALUES (
+                NEW.payer_inn,
+                NEW.id,
+                NEW.amount_kopecks,
+                strftime('%Y-%m-%d %H:%M:%f', 'now')
+            );
+            UPDATE organizations
+            SET balance_kopecks = balance_kopecks + NEW.amount_kopecks,
+                updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+            WHERE inn = NEW.payer_inn;
+        END
+    """,
+}
+
+
+def create_trigger(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE_TRIGGER:
+        raise NotSupportedError(f"Триггер начисления не реализован для {vendor}")
+    schema_editor.execute(CREATE_TRIGGER[vendor], params=None)
+
+
+def drop_trigger(apps, schema_editor):
+    schema_editor.execute("DROP TRIGGER IF EXISTS payments_after_insert")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0006_organization_inn_validator"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
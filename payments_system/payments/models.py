@@ -1,26 +1,45 @@
+from decimal import Decimal
+from django.contrib import admin
 from django.db import models
-from django.core.validators import RegexValidator
+from django.core.exceptions import ValidationError
 import uuid
 
 
+# Денежные суммы хранятся в копейках, наружу отдаются как Decimal в рублях
+def to_kopecks(amount):
+    return int(amount.scaleb(2))
+
+
+def from_kopecks(kopecks):
+    if kopecks is None:
+        return None
+    return Decimal(kopecks).scaleb(-2)
+
+
+# Проверка без регулярного выражения: длина и isdigit выполняются на уровне C.
+# isascii отсекает прочие Unicode-цифры, которые isdigit тоже принимает.
+def is_valid_inn(value):
+    return len(value) in (10, 12) and value.isascii() and value.isdigit()
+
+
+def validate_inn(value):
+    if not is_valid_inn(value):
+        raise ValidationError("ИНН должен состоять из 10 или 12 цифр.")
+
+
 class Organization(models.Model):
-    inn_validator = RegexValidator(
-        regex=r"^\d{10}$|^\d{12}$", message="ИНН должен состоять из 10 или 12 цифр."
-    )
     inn = models.CharField(
         max_length=12,
         unique=True,
         db_index=True,
-        validators=[inn_validator],
+        validators=[validate_inn],
         verbose_name="ИНН",
         help_text="Идентификационный Номер Налогоплательщика организации.",
     )
-    balance = models.DecimalField(
-        max_digits=15,
-        decimal_places=2,
-        default=0.00,
-        verbose_name="Баланс",
-        help_text="Текущий баланс организации.",
+    balance_kopecks = models.BigIntegerField(
+        default=0,
+        verbose_name="Баланс, коп.",
+        help_text="Текущий баланс организации в копейках.",
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
@@ -31,10 +50,19 @@ class Organization(models.Model):
         verbose_name = "Организация"
         verbose_name_plural = "Организации"
 
+    @property
+    @admin.display(description="Баланс", ordering="balance_kopecks")
+    def balance(self):
+        return from_kopecks(self.balance_kopecks)
+
     def __str__(self):
         return f"Организация ИНН: {self.inn} | Баланс: {self.balance}"
 
 
+# Начисление на баланс и запись BalanceLog при вставке платежа выполняет
+# триггер payments_after_insert (миграция 0007). Триггер не знает о кэше, поэтому
+# любой код, вставляющий платежи, после коммита сбрасывает ключи bal:<inn>
+# (payments.cache.invalidate_balances).
 class Payment(models.Model):
     operation_id = models.UUIDField(
         default=uuid.uuid4,
@@ -42,12 +70,12 @@ class Payment(models.Model):
         db_index=True,
         verbose_name="Идентификатор операции",
     )
-    amount = models.DecimalField(
-        max_digits=15, decimal_places=2, verbose_name="Сумма платежа"
-    )
+    amount_kopecks = models.BigIntegerField(verbose_name="Сумма платежа, коп.")
     payer = models.ForeignKey(
         Organization,
         on_delete=models.CASCADE,
+        to_field="inn",
+        db_column="payer_inn",
         related_name="payments",
         verbose_name="Плательщик",
     )
@@ -60,9 +88,20 @@ class Payment(models.Model):
     class Meta:
         db_table = "payments"
         ordering = ["-document_date"]
+        indexes = [
+            models.Index(fields=["-document_date"], name="pay_docdate_desc_idx"),
+            models.Index(
+                fields=["payer", "-document_date"], name="pay_payer_docdate_idx"
+            ),
+        ]
         verbose_name = "Платеж"
         verbose_name_plural = "Платежи"
 
+    @property
+    @admin.display(description="Сумма платежа", ordering="amount_kopecks")
+    def amount(self):
+        return from_kopecks(self.amount_kopecks)
+
     def __str__(self):
         return f"Платеж {self.operation_id} | Сумма: {self.amount} | Документ: {self.document_number} | Плательщик: {self.payer.inn}"
 
@@ -71,6 +110,8 @@ class BalanceLog(models.Model):
     organization = models.ForeignKey(
         Organization,
         on_delete=models.CASCADE,
+        to_field="inn",
+        db_column="organization_inn",
         related_name="balance_logs",
         verbose_name="Организация",
     )
@@ -80,8 +121,8 @@ class BalanceLog(models.Model):
         related_name="balance_logs",
         verbose_name="Платеж",
     )
-    amount_changed = models.DecimalField(
-        max_digits=15, decimal_places=2, verbose_name="Сумма изменения"
+    amount_changed_kopecks = models.BigIntegerField(
+        verbose_name="Сумма изменения, коп."
     )
     timestamp = models.DateTimeField(
         auto_now_add=True, db_index=True, verbose_name="Время изменения"
@@ -90,8 +131,37 @@ class BalanceLog(models.Model):
     class Meta:
         db_table = "balance_logs"
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["organization", "-timestamp"], name="blog_org_ts_idx"),
+        ]
         verbose_name = "Лог изменения баланса"
         verbose_name_plural = "Логи изменения баланса"
 
+    @property
+    @admin.display(description="Сумма изменения", ordering="amount_changed_kopecks")
+    def amount_changed(self):
+        return from_kopecks(self.amount_changed_kopecks)
+
     def __str__(self):
         return f"Лог для {self.organization.inn} | Изменение: {self.amount_changed} | Время: {self.timestamp}"
+
+
+class WebhookInbox(models.Model):
+    operation_id = models.UUIDField(unique=True, verbose_name="Идентификатор операции")
+    payload = models.JSONField(verbose_name="Тело вебхука")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата получения")
+    processed_at = models.DateTimeField(
+        null=True, blank=True, db_index=True, verbose_name="Дата обработки"
+    )
+    error = models.CharField(
+        max_length=255, blank=True, default="", verbose_name="Ошибка обработки"
+    )
+
+    class Meta:
+        db_table = "webhook_inbox"
+        ordering = ["created_at"]
+        verbose_name = "Входящий вебхук"
+        verbose_name_plural = "Входящие вебхуки"
+
+    def __str__(self):
+        return f"Вебхук {self.operation_id} | Получен: {self.created_at}"
@@ -0,0 +1,121 @@
+import re
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Annotated, Union
+
+import msgspec
+from django.utils import timezone
+
+from .models import is_valid_inn, to_kopecks
+
+# Ограничения суммы совпадают с DecimalField(max_digits=15, decimal_places=2)
+AMOUNT_MAX_DIGITS = 15
+AMOUNT_DECIMAL_PLACES = 2
+
+# Совпадает с Payment.document_number; проверяется уже после обрезки пробелов
+DOCUMENT_NUMBER_MAX_LENGTH = 50
+
+
+class WebhookPayload(msgspec.Struct):
+    operation_id: uuid.UUID
+    amount: Decimal
+    payer_inn: str
+    document_number: str
+    document_date: datetime
+
+    @property
+    def amount_kopecks(self):
+        return to_kopecks(self.amount)
+
+    def __post_init__(self):
+        # Как и DRF CharField, отбрасываем пробелы по краям строк до проверок
+        self.payer_inn = self.payer_inn.strip()
+        self.document_number = self.document_number.strip()
+        if timezone.is_naive(self.document_date):
+            self.document_date = timezone.make_aware(self.document_date)
+
+
+def _check_amount(amount):
+    if not amount.is_finite():
+        return "Недопустимая сумма платежа."
+    _, digits, exponent = amount.as_tuple()
+    decimal_places = max(-exponent, 0)
+    whole_digits = max(len(digits) + exponent, 0)
+    if decimal_places > AMOUNT_DECIMAL_PLACES:
+        return f"Сумма должна содержать не более {AMOUNT_DECIMAL_PLACES} знаков после запятой."
+    if whole_digits > AMOUNT_MAX_DIGITS - AMOUNT_DECIMAL_PLACES:
+        return f"Сумма должна содержать не более {AMOUNT_MAX_DIGITS} цифр."
+    return None
+
+
+def _check_payer_inn(payer_inn):
+    if not is_valid_inn(payer_inn):
+        return "ИНН должен состоять из 10 или 12 цифр."
+    return None
+
+
+def _check_document_number(document_number):
+    if not document_number:
+        return "Номер документа не может быть пустым."
+    if len(document_number) > DOCUMENT_NUMBER_MAX_LENGTH:
+        return f"Номер документа должен содержать не более {DOCUMENT_NUMBER_MAX_LENGTH} символов."
+    return None
+
+
+_FIELD_CHECKS = (
+    ("amount", _check_amount),
+    ("payer_inn", _check_payer_inn),
+    ("document_number", _check_document_number),
+)
+
+
+# Проверки полей выполняются после разбора, а не в __post_init__: так ошибка
+# получает путь к полю в том же формате, что и ошибки самого msgspec.
+def _validate(payload, path="$"):
+    for field, check in _FIELD_CHECKS:
+        message = check(getattr(payload, field))
+        if message:
+            raise msgspec.ValidationError(f"{message} - at `{path}.{field}`")
+    return payload
+
+
+# Пакетный режим: банк может прислать массив платежей одним запросом.
+# Пакет проводится в одной транзакции под блокировкой организаций, поэтому
+# его размер ограничен одной пачкой INSERT (services.BULK_BATCH_SIZE).
+WEBHOOK_BATCH_MAX_LENGTH = 1000
+
+WebhookBatch = Annotated[
+    list[WebhookPayload],
+    msgspec.Meta(min_length=1, max_length=WEBHOOK_BATCH_MAX_LENGTH),
+]
+
+_webhook_decoder = msgspec.json.Decoder(Union[WebhookPayload, WebhookBatch])
+
+
+def decode_webhook(body):
+    payload = _webhook_decoder.decode(body)
+    if isinstance(payload, list):
+        for index, item in enumerate(payload):
+            _validate(item, f"$[{index}]")
+        return payload
+    return _validate(payload)
+
+
+def convert_webhook(obj):
+    return _validate(msgspec.convert(obj, WebhookPayload))
+
+
+_ERROR_PATH = re.compile(r"^(?P<message>.*?)(?: - at `\$(?P<path>[^`]*)`)?$", re.S)
+_MISSING_FIELD = re.compile(r"^Object missing required field `(?P<field>[^`]+)`$")
+
+
+# Ошибка разбора в формате DRF: {"поле": ["сообщение"]}. Ключом служит путь
+# msgspec без "$." (amount, [1].amount), ошибки без поля — non_field_errors.
+def error_details(error):
+    match = _ERROR_PATH.match(str(error))
+    message, path = match["message"], (match["path"] or "").lstrip(".")
+    missing = _MISSING_FIELD.match(message)
+    if missing:
+        path = f"{path}.{missing['field']}" if path else missing["field"]
+    return {path or "non_field_errors": [message]}
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Organization
 
 
+# Описывает тело вебхука для Swagger; разбор и валидация — payments.schemas
 class WebhookSerializer(serializers.Serializer):
     operation_id = serializers.UUIDField(
         help_text="Уникальный идентификатор операции в формате UUID."
@@ -17,6 +18,8 @@ class WebhookSerializer(serializers.Serializer):
 
 
 class BalanceSerializer(serializers.ModelSerializer):
+    balance = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
+
     class Meta:
         model = Organization
         fields = ["inn", "balance"]
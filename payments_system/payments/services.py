@@ -0,0 +1,135 @@
+import msgspec
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+
+from .cache import invalidate_balances
+from .models import Organization, Payment, WebhookInbox
+from .schemas import convert_webhook
+
+# Размер пачки строк в одном INSERT при массовой вставке
+BULK_BATCH_SIZE = 1000
+
+# Сколько вебхуков из входящей очереди обрабатывается за одну транзакцию
+INBOX_BATCH_SIZE = 500
+
+ERROR_MAX_LENGTH = WebhookInbox._meta.get_field("error").max_length
+
+
+def apply_payments_batch(payloads):
+    # Повторы operation_id внутри пакета схлопываются до первого вхождения
+    unique = {}
+    for payload in payloads:
+        unique.setdefault(payload.operation_id, payload)
+    duplicates = len(payloads) - len(unique)
+    inns = {payload.payer_inn for payload in unique.values()}
+
+    with transaction.atomic():
+        organizations = (
+            Organization.objects.select_for_update()
+            .only("pk", "inn")
+            .in_bulk(inns, field_name="inn")
+        )
+        existing = set(
+            Payment.objects.filter(operation_id__in=list(unique)).values_list(
+                "operation_id", flat=True
+            )
+        )
+        duplicates += len(existing)
+        new = [
+            payload
+            for payload in unique.values()
+            if payload.operation_id not in existing
+            and payload.payer_inn in organizations
+        ]
+
+        # Строки отфильтрованы заранее под блокировкой организаций, поэтому
+        # ignore_conflicts не нужен: каждая вставленная строка даёт начисление.
+        # Баланс и логи обновляет триггер payments_after_insert.
+        Payment.objects.bulk_create(
+            [
+                Payment(
+                    operation_id=payload.operation_id,
+                    amount_kopecks=payload.amount_kopecks,
+                    payer=organizations[payload.payer_inn],
+                    document_number=payload.document_number,
+                    document_date=payload.document_date,
+                )
+                for payload in new
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        credited = {payload.payer_inn for payload in new}
+        transaction.on_commit(lambda: invalidate_balances(credited))
+
+    return {
+        "created": len(new),
+        "duplicates": duplicates,
+        "not_found": sorted(inns - organizations.keys()),
+    }
+
+
+def enqueue_webhooks(payloads):
+    # Повторный operation_id отсекается уникальным индексом очереди
+    WebhookInbox.objects.bulk_create(
+        [
+            WebhookInbox(
+                operation_id=payload.operation_id,
+                payload=msgspec.to_builtins(payload),
+            )
+            for payload in payloads
+        ],
+        ignore_conflicts=True,
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+
+def process_inbox_batch(limit=INBOX_BATCH_SIZE):
+    with transaction.atomic():
+        rows = list(
+            WebhookInbox.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True)
+            .order_by("created_at")[:limit]
+        )
+        if not rows:
+            return 0
+
+        valid = []
+        for row in rows:
+            try:
+                valid.append((row, convert_webhook(row.payload)))
+            except msgspec.ValidationError as e:
+                row.error = f"Неверные данные: {e}"[:ERROR_MAX_LENGTH]
+
+        try:
+            not_found = set(apply_payments_batch([p for _, p in valid])["not_found"])
+            for row, payload in valid:
+                if payload.payer_inn in not_found:
+                    row.error = "Организация не найдена"
+        except OperationalError:
+            # Блокировки и обрывы соединения не связаны с самими строками —
+            # транзакция откатывается, и пакет берётся заново в следующий раз
+            raise
+        except Exception:
+            # Пакет откатился до точки сохранения — проводим по одному,
+            # чтобы найти виновника и не блокировать им очередь
+            for row, payload in valid:
+                row.error = _apply_inbox_payload(payload)
+
+        now = timezone.now()
+        for row in rows:
+            row.processed_at = now
+        WebhookInbox.objects.bulk_update(rows, ["processed_at", "error"])
+    return len(rows)
+
+
+def _apply_inbox_payload(payload):
+    try:
+        if apply_payments_batch([payload])["not_found"]:
+            return "Организация не найдена"
+    except IntegrityError:
+        return "Номер документа должен быть уникальным"
+    except OperationalError:
+        raise
+    except Exception as e:
+        return str(e)[:ERROR_MAX_LENGTH]
+    return ""
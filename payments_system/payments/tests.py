@@ -0,0 +1,490 @@
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+import msgspec
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+
+from .cache import balance_cache_key
+from .models import BalanceLog, Organization, Payment, WebhookInbox
+from .paginators import ESTIMATE_THRESHOLD, FasterAdminPaginator
+from .schemas import (
+    WEBHOOK_BATCH_MAX_LENGTH,
+    WebhookPayload,
+    decode_webhook,
+    error_details,
+)
+from .services import apply_payments_batch, enqueue_webhooks, process_inbox_batch
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+def make_payment(payer, amount_kopecks=10000, document_number="PAY-1"):
+    return Payment(
+        operation_id=uuid.uuid4(),
+        amount_kopecks=amount_kopecks,
+        payer=payer,
+        document_number=document_number,
+        document_date=timezone.now(),
+    )
+
+
+def make_payload(payer_inn="1234567890", amount="1.00", document_number="PAY-1"):
+    return WebhookPayload(
+        operation_id=uuid.uuid4(),
+        amount=Decimal(amount),
+        payer_inn=payer_inn,
+        document_number=document_number,
+        document_date=timezone.now(),
+    )
+
+
+def webhook_body(**fields):
+    body = msgspec.to_builtins(make_payload())
+    body.update(fields)
+    return body
+
+
+class WebhookSchemaTests(SimpleTestCase):
+    def details(self, body):
+        with self.assertRaises(msgspec.ValidationError) as raised:
+            decode_webhook(msgspec.json.encode(body))
+        return error_details(raised.exception)
+
+    def test_strips_strings_before_validation(self):
+        payload = decode_webhook(
+            msgspec.json.encode(
+                webhook_body(payer_inn=" 1234567890 ", document_number=" PAY-1 ")
+            )
+        )
+        self.assertEqual(payload.payer_inn, "1234567890")
+        self.assertEqual(payload.document_number, "PAY-1")
+
+    def test_field_checks_are_keyed_by_field(self):
+        cases = [
+            (
+                {"amount": "1.234"},
+                "amount",
+                "Сумма должна содержать не более 2 знаков после запятой.",
+            ),
+            (
+                {"amount": "1" * 14},
+                "amount",
+                "Сумма должна содержать не более 15 цифр.",
+            ),
+            ({"amount": "NaN"}, "amount", "Недопустимая сумма платежа."),
+            (
+                {"payer_inn": "12345"},
+                "payer_inn",
+                "ИНН должен состоять из 10 или 12 цифр.",
+            ),
+            (
+                {"document_number": "   "},
+                "document_number",
+                "Номер документа не может быть пустым.",
+            ),
+        ]
+        for fields, key, message in cases:
+            with self.subTest(fields=fields):
+                self.assertEqual(self.details(webhook_body(**fields)), {key: [message]})
+
+    def test_msgspec_errors_are_keyed_by_path(self):
+        body = webhook_body()
+        del body["amount"]
+        self.assertEqual(
+            self.details(body), {"amount": ["Object missing required field `amount`"]}
+        )
+        self.assertEqual(
+            self.details([webhook_body(), body]),
+            {"[1].amount": ["Object missing required field `amount`"]},
+        )
+        self.assertEqual(
+            self.details(webhook_body(amount="abc")),
+            {"amount": ["Invalid decimal string"]},
+        )
+        self.assertEqual(
+            self.details([webhook_body(payer_inn="1")]),
+            {"[0].payer_inn": ["ИНН должен состоять из 10 или 12 цифр."]},
+        )
+
+    def test_errors_without_field_go_to_non_field_errors(self):
+        self.assertEqual(
+            self.details([]), {"non_field_errors": ["Expected `array` of length >= 1"]}
+        )
+        with self.assertRaises(msgspec.DecodeError) as raised:
+            decode_webhook(b"{")
+        self.assertEqual(list(error_details(raised.exception)), ["non_field_errors"])
+
+
+class PaymentTriggerTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(inn="1234567890")
+
+    def test_insert_credits_balance_and_writes_log(self):
+        payment = make_payment(self.organization, amount_kopecks=14500043)
+        payment.save()
+
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.balance_kopecks, 14500043)
+        log = BalanceLog.objects.get(payment=payment)
+        self.assertEqual(log.organization_id, "1234567890")
+        self.assertEqual(log.amount_changed_kopecks, 14500043)
+
+    def test_bulk_create_credits_every_payment(self):
+        Payment.objects.bulk_create(
+            [
+                make_payment(self.organization, 100, "PAY-1"),
+                make_payment(self.organization, 250, "PAY-2"),
+            ]
+        )
+
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.balance_kopecks, 350)
+        self.assertEqual(
+            sorted(BalanceLog.objects.values_list("amount_changed_kopecks", flat=True)),
+            [100, 250],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PaymentAdminTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(inn="1234567890")
+        user = User.objects.create_superuser("admin", "admin@example.com", "admin")
+        self.client.force_login(user)
+
+    def test_add_payment_in_roubles_and_invalidate_balance(self):
+        key = balance_cache_key("1234567890")
+        cache.set(key, {"inn": "1234567890", "balance": "0.00"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/admin/payments/payment/add/",
+                {
+                    "operation_id": str(uuid.uuid4()),
+                    "payer": "1234567890",
+                    "amount": "100",
+                    "document_number": "ADM-1",
+                    "document_date_0": "2024-04-27",
+                    "document_date_1": "21:00:00",
+                    "balance_logs-TOTAL_FORMS": "0",
+                    "balance_logs-INITIAL_FORMS": "0",
+                },
+            )
+
+        self.assertEqual(response.status_code, 302)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.balance_kopecks, 10000)
+        self.assertIsNone(cache.get(key))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ApplyPaymentsBatchTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(inn="1234567890")
+
+    def test_skips_duplicates_and_unknown_inns(self):
+        stored = make_payload(document_number="PAY-0")
+        apply_payments_batch([stored])
+        repeated = make_payload(amount="2.50", document_number="PAY-1")
+
+        result = apply_payments_batch(
+            [
+                repeated,
+                repeated,
+                stored,
+                make_payload(payer_inn="999999999999", document_number="PAY-2"),
+            ]
+        )
+
+        self.assertEqual(
+            result, {"created": 1, "duplicates": 2, "not_found": ["999999999999"]}
+        )
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.balance_kopecks, 350)
+        self.assertEqual(BalanceLog.objects.count(), 2)
+
+    def test_duplicate_document_number_rolls_back_batch(self):
+        apply_payments_batch([make_payload(document_number="PAY-1")])
+
+        with self.assertRaises(IntegrityError):
+            apply_payments_batch(
+                [
+                    make_payload(amount="5.00", document_number="PAY-2"),
+                    make_payload(amount="7.00", document_number="PAY-1"),
+                ]
+            )
+
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.balance_kopecks, 100)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_invalidates_cached_balance(self):
+        key = balance_cache_key("1234567890")
+        cache.set(key, {"inn": "1234567890", "balance": "0.00"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_payments_batch([make_payload()])
+
+        self.assertIsNone(cache.get(key))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProcessInboxBatchTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(inn="1234567890")
+        apply_payments_batch([make_payload(document_number="PAY-0")])
+
+    def test_marks_bad_rows_and_applies_the_rest(self):
+        good = make_payload(amount="2.50", document_number="PAY-1")
+        enqueue_webhooks(
+            [
+                good,
+                make_payload(document_number="PAY-0"),
+                make_payload(payer_inn="999999999999", document_number="PAY-2"),
+            ]
+        )
+        broken = dict(
+            msgspec.to_builtins(make_payload(document_number="PAY-3")), amount="abc"
+        )
+        WebhookInbox.objects.create(operation_id=broken["operation_id"], payload=broken)
+
+        self.assertEqual(process_inbox_batch(), 4)
+
+        self.assertFalse(
+            WebhookInbox.objects.filter(processed_at__isnull=True).exists()
+        )
+        errors = dict(
+            WebhookInbox.objects.values_list("payload__document_number", "error")
+        )
+        self.assertEqual(errors["PAY-1"], "")
+        self.assertEqual(errors["PAY-0"], "Номер документа должен быть уникальным")
+        self.assertEqual(errors["PAY-2"], "Организация не найдена")
+        self.assertTrue(errors["PAY-3"].startswith("Неверные данные"))
+        self.assertTrue(Payment.objects.filter(operation_id=good.operation_id).exists())
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.balance_kopecks, 350)
+
+    def test_operational_error_leaves_rows_pending(self):
+        enqueue_webhooks([make_payload(document_number="PAY-1")])
+
+        with mock.patch(
+            "payments.services.apply_payments_batch",
+            side_effect=OperationalError("Deadlock found"),
+        ):
+            with self.assertRaises(OperationalError):
+                process_inbox_batch()
+
+        self.assertTrue(WebhookInbox.objects.filter(processed_at__isnull=True).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BankWebhookViewTests(TestCase):
+    url = "/api/webhook/bank/"
+
+    def setUp(self):
+        self.organization = Organization.objects.create(inn="1234567890")
+
+    def post(self, body):
+        return self.client.post(
+            self.url, msgspec.json.encode(body), content_type="application/json"
+        )
+
+    def post_committed(self, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.post(body)
+
+    def assert_balance(self, balance_kopecks, logs):
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.balance_kopecks, balance_kopecks)
+        self.assertEqual(BalanceLog.objects.count(), logs)
+
+    def test_new_payment_is_credited(self):
+        response = self.post_committed(webhook_body(amount="145000.43"))
+
+        self.assertEqual(response.status_code, 201)
+        self.assert_balance(14500043, logs=1)
+
+    def test_repeat_delivery_is_short_circuited_by_cache(self):
+        body = webhook_body()
+        self.post_committed(body)
+
+        with self.assertNumQueries(0):
+            response = self.post_committed(body)
+
+        self.assertEqual(response.status_code, 200)
+        self.assert_balance(100, logs=1)
+
+    def test_repeat_delivery_without_cache_is_rejected_by_database(self):
+        body = webhook_body()
+        self.post_committed(body)
+        cache.clear()
+
+        response = self.post_committed(body)
+
+        self.assertEqual(response.status_code, 200)
+        self.assert_balance(100, logs=1)
+        self.assertIsNotNone(cache.get(f"op:{body['operation_id']}"))
+
+    def test_duplicate_document_number_is_rejected(self):
+        self.post_committed(webhook_body(document_number="PAY-1"))
+        body = webhook_body(document_number="PAY-1")
+
+        response = self.post_committed(body)
+
+        self.assertEqual(response.status_code, 400)
+        self.assert_balance(100, logs=1)
+        self.assertIsNone(cache.get(f"op:{body['operation_id']}"))
+
+    def test_invalid_body_is_rejected(self):
+        response = self.post(webhook_body(amount="1.234"))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()["details"]), ["amount"])
+
+    def test_oversized_batch_is_rejected(self):
+        body = [
+            webhook_body(document_number=f"PAY-{i}")
+            for i in range(WEBHOOK_BATCH_MAX_LENGTH + 1)
+        ]
+
+        response = self.post(body)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["details"],
+            {
+                "non_field_errors": [
+                    f"Expected `array` of length <= {WEBHOOK_BATCH_MAX_LENGTH}"
+                ]
+            },
+        )
+        self.assertFalse(Payment.objects.exists())
+
+    def test_batch_is_stored_when_cache_is_down(self):
+        with mock.patch.object(
+            cache, "delete_many", side_effect=ConnectionError("cache down")
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.post([make_payload(document_number="R2")])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Payment.objects.filter(document_number="R2").exists())
+
+
+# SQLite и PostgreSQL проверяют внешние ключи Django только при коммите,
+# поэтому неизвестный ИНН проверяется с настоящей транзакцией
+@override_settings(CACHES=LOCMEM_CACHES)
+class BankWebhookUnknownInnTests(TransactionTestCase):
+    def test_unknown_inn_is_not_found(self):
+        response = self.client.post(
+            BankWebhookViewTests.url,
+            msgspec.json.encode(webhook_body(payer_inn="999999999999")),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Payment.objects.exists())
+        self.assertFalse(BalanceLog.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BalanceViewTests(TestCase):
+    url = "/api/organizations/1234567890/balance/"
+
+    def setUp(self):
+        self.organization = Organization.objects.create(
+            inn="1234567890", balance_kopecks=14500043
+        )
+
+    def test_falls_back_to_database_when_cache_is_down(self):
+        error = ConnectionError("cache down")
+        with mock.patch.object(cache, "get", side_effect=error), mock.patch.object(
+            cache, "set", side_effect=error
+        ):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"inn": "1234567890", "balance": "145000.43"})
+
+    def get_balance(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["balance"]
+
+    def post_webhook(self, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                BankWebhookViewTests.url,
+                msgspec.json.encode(body),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_serves_from_cache_until_a_payment_is_committed(self):
+        self.assertEqual(self.get_balance(), "145000.43")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_balance(), "145000.43")
+
+        self.post_webhook(webhook_body(amount="1.00", document_number="PAY-1"))
+        self.assertEqual(self.get_balance(), "145001.43")
+
+        self.post_webhook(
+            [
+                webhook_body(amount="2.00", document_number="PAY-2"),
+                webhook_body(amount="3.00", document_number="PAY-3"),
+            ]
+        )
+        self.assertEqual(self.get_balance(), "145006.43")
+
+
+class FasterAdminPaginatorTests(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(inn="1234567890")
+        Payment.objects.bulk_create(
+            [make_payment(organization, document_number=f"PAY-{i}") for i in range(3)]
+        )
+
+    def count(self, queryset, estimate):
+        with mock.patch.object(
+            FasterAdminPaginator, "_estimated_count", return_value=estimate
+        ) as estimated_count:
+            count = FasterAdminPaginator(queryset, 25).count
+        return count, estimated_count.called
+
+    def test_filtered_queryset_is_counted_exactly(self):
+        queryset = Payment.objects.filter(document_number="PAY-1")
+        self.assertEqual(self.count(queryset, ESTIMATE_THRESHOLD * 10), (1, False))
+
+    def test_small_or_missing_estimate_falls_back_to_count(self):
+        queryset = Payment.objects.all()
+        self.assertEqual(self.count(queryset, None), (3, True))
+        self.assertEqual(self.count(queryset, ESTIMATE_THRESHOLD), (3, True))
+
+    def test_large_estimate_replaces_count(self):
+        estimate = ESTIMATE_THRESHOLD + 1
+        self.assertEqual(self.count(Payment.objects.all(), estimate), (estimate, True))
+
+    def test_loaded_queryset_skips_estimate(self):
+        queryset = Payment.objects.all()
+        list(queryset)
+        self.assertEqual(self.count(queryset, ESTIMATE_THRESHOLD * 10), (3, False))
+
+    def test_unsupported_vendor_has_no_estimate(self):
+        with mock.patch.object(connection, "vendor", "oracle"):
+            estimate = FasterAdminPaginator(
+                Payment.objects.all(), 25
+            )._estimated_count()
+        self.assertIsNone(estimate)
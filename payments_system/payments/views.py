@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction, IntegrityError
 from drf_yasg import openapi
 from rest_framework.views import APIView
@@ -5,18 +7,46 @@ from rest_framework.response import Response
 from rest_framework import status
 from drf_yasg.utils import swagger_auto_schema
 import logging
-from .models import Payment, Organization, BalanceLog
+import msgspec
+from .cache import cache_balance, get_cached_balance, invalidate_balances
+from .models import Payment, Organization, from_kopecks
+from .schemas import decode_webhook, error_details
+from .services import apply_payments_batch, enqueue_webhooks
 from .serializers import WebhookSerializer, BalanceSerializer
 
 logger = logging.getLogger(__name__)
 
+# Время жизни ключа идемпотентности вебхука (сутки)
+IDEMPOTENCY_TTL = 60 * 60 * 24
+
+
+# Кэш идемпотентности лишь ускоряет ответ на повтор: при недоступном кэше
+# вебхук идёт в БД, где дубль всё равно отсекает уникальный индекс.
+def _is_processed(key):
+    try:
+        return cache.get(key) is not None
+    except Exception as e:
+        logger.warning(f"Кэш идемпотентности недоступен: {str(e)}")
+        return False
+
+
+def _mark_processed(key):
+    try:
+        cache.set(key, 1, timeout=IDEMPOTENCY_TTL)
+    except Exception as e:
+        logger.warning(f"Кэш идемпотентности недоступен: {str(e)}")
+
 
 class BankWebhookView(APIView):
     @swagger_auto_schema(
-        operation_description="Обработка вебхука от банка для начисления баланса организации.",
+        operation_description=(
+            "Обработка вебхука от банка для начисления баланса организации. "
+            "Тело может быть и массивом платежей — тогда они проводятся одним пакетом."
+        ),
         request_body=WebhookSerializer,
         responses={
             201: "Вебхук успешно обработан",
+            202: "Вебхук принят в очередь на обработку",
             200: "Дублирующий вебхук проигнорирован",
             400: "Неверный формат данных или бизнес-правила",
             404: "Организация не найдена",
@@ -24,80 +54,138 @@ class BankWebhookView(APIView):
         },
     )
     def post(self, request):
-        serializer = WebhookSerializer(data=request.data)
-        if not serializer.is_valid():
-            logger.error(f"Неверные данные вебхука: {serializer.errors}")
+        try:
+            payload = decode_webhook(request.body)
+        except msgspec.DecodeError as e:
+            logger.error(f"Неверные данные вебхука: {str(e)}")
             return Response(
-                {"error": "Неверный формат данных", "details": serializer.errors},
+                {"error": "Неверный формат данных", "details": error_details(e)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        data = serializer.validated_data
-        operation_id = data["operation_id"]
-        payer_inn = data["payer_inn"]
-        document_number = data["document_number"]
+        if settings.WEBHOOK_ASYNC_PROCESSING:
+            return self._post_enqueue(payload)
 
-        # Проверка дублирования операции
-        if Payment.objects.filter(operation_id=operation_id).exists():
+        if isinstance(payload, list):
+            return self._post_batch(payload)
+
+        operation_id = payload.operation_id
+        payer_inn = payload.payer_inn
+        document_number = payload.document_number
+
+        # Быстрая проверка повтора через кэш, без обращения к БД. Ключ ставится
+        # только после коммита, поэтому упавшая на середине обработка не
+        # превращает повтор от банка в ложный 200.
+        idempotency_key = f"op:{operation_id}"
+        if _is_processed(idempotency_key):
             logger.info(
                 f"Дублирующий вебхук проигнорирован для operation_id: {operation_id}"
             )
             return Response({"status": "success"}, status=status.HTTP_200_OK)
 
-        # Проверка существования организации
-        try:
-            organization = Organization.objects.get(inn=payer_inn)
-        except Organization.DoesNotExist:
-            logger.error(f"Организация с ИНН {payer_inn} не найдена")
-            return Response(
-                {"error": "Организация не найдена"}, status=status.HTTP_404_NOT_FOUND
-            )
-
-        # Проверка уникальности номера документа
-        if Payment.objects.filter(document_number=document_number).exists():
-            logger.error(f"Дублирующий номер документа: {document_number}")
-            return Response(
-                {"error": "Номер документа должен быть уникальным"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # Создание платежа и обновление баланса в транзакции
+        # Один INSERT: баланс и лог обновляет триггер payments_after_insert.
+        # Дубли operation_id и document_number, а также неизвестный ИНН
+        # (внешний ключ на organizations.inn) отсекаются ограничениями БД,
+        # без предварительных SELECT.
         try:
             with transaction.atomic():
-                payment = Payment.objects.create(
+                Payment.objects.create(
                     operation_id=operation_id,
-                    amount=data["amount"],
-                    payer=organization,
+                    amount_kopecks=payload.amount_kopecks,
+                    payer_id=payer_inn,
                     document_number=document_number,
-                    document_date=data["document_date"],
+                    document_date=payload.document_date,
                 )
-                organization.balance += data["amount"]
-                organization.save()
+                transaction.on_commit(lambda: invalidate_balances([payer_inn]))
+                transaction.on_commit(lambda: _mark_processed(idempotency_key))
 
-                BalanceLog.objects.create(
-                    organization=organization,
-                    payment=payment,
-                    amount_changed=data["amount"],
-                )
+        except IntegrityError as e:
+            response = self._integrity_error_response(
+                e, operation_id, payer_inn, document_number
+            )
+            if response.status_code == status.HTTP_200_OK:
+                _mark_processed(idempotency_key)
+            return response
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при обработке вебхука: {str(e)}")
+            return Response(
+                {"error": "Внутренняя ошибка сервера"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
-            logger.info(
-                f"Обработан платеж {operation_id} для ИНН {organization.inn}: {data['amount']}"
+        logger.info(
+            f"Обработан платеж {operation_id} для ИНН {payer_inn}: {payload.amount}"
+        )
+        return Response({"status": "success"}, status=status.HTTP_201_CREATED)
+
+    def _post_enqueue(self, payload):
+        payloads = payload if isinstance(payload, list) else [payload]
+        try:
+            enqueue_webhooks(payloads)
+        except Exception as e:
+            logger.error(f"Не удалось поставить вебхук в очередь: {str(e)}")
+            return Response(
+                {"error": "Внутренняя ошибка сервера"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-            return Response({"status": "success"}, status=status.HTTP_201_CREATED)
 
+        logger.info(f"Принято в очередь вебхуков: {len(payloads)}")
+        return Response({"status": "accepted"}, status=status.HTTP_202_ACCEPTED)
+
+    def _post_batch(self, payloads):
+        try:
+            result = apply_payments_batch(payloads)
         except IntegrityError as e:
-            logger.error(f"Ошибка базы данных при обработке вебхука: {str(e)}")
+            logger.error(f"Нарушение уникальности в пакете платежей: {str(e)}")
             return Response(
-                {"error": "Ошибка базы данных"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                {"error": "Номера документов должны быть уникальными"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
         except Exception as e:
-            logger.error(f"Неожиданная ошибка при обработке вебхука: {str(e)}")
+            logger.error(f"Неожиданная ошибка при обработке пакета: {str(e)}")
             return Response(
                 {"error": "Внутренняя ошибка сервера"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        if result["not_found"]:
+            logger.error(f"Организации с ИНН {result['not_found']} не найдены")
+        logger.info(
+            f"Обработан пакет платежей: создано {result['created']}, "
+            f"дублей {result['duplicates']}"
+        )
+        return Response({"status": "success", **result}, status=status.HTTP_201_CREATED)
+
+    def _integrity_error_response(
+        self, error, operation_id, payer_inn, document_number
+    ):
+        # Определяем, какое ограничение сработало. Запросы выполняются
+        # только на пути ошибки, счастливый путь их не платит.
+        if Payment.objects.filter(operation_id=operation_id).exists():
+            logger.info(
+                f"Дублирующий вебхук проигнорирован для operation_id: {operation_id}"
+            )
+            return Response({"status": "success"}, status=status.HTTP_200_OK)
+
+        if not Organization.objects.filter(inn=payer_inn).exists():
+            logger.error(f"Организация с ИНН {payer_inn} не найдена")
+            return Response(
+                {"error": "Организация не найдена"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        if Payment.objects.filter(document_number=document_number).exists():
+            logger.error(f"Дублирующий номер документа: {document_number}")
+            return Response(
+                {"error": "Номер документа должен быть уникальным"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        logger.error(f"Ошибка базы данных при обработке вебхука: {str(error)}")
+        return Response(
+            {"error": "Ошибка базы данных"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
 
 class BalanceView(APIView):
     @swagger_auto_schema(
@@ -124,10 +212,15 @@ class BalanceView(APIView):
         },
     )
     def get(self, request, inn):
+        data = get_cached_balance(inn)
+        if data is not None:
+            return Response(data, status=status.HTTP_200_OK)
+
         try:
-            organization = Organization.objects.get(inn=inn)
-            serializer = BalanceSerializer(organization)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            # Читаем один столбец без создания экземпляра модели
+            balance_kopecks = Organization.objects.values_list(
+                "balance_kopecks", flat=True
+            ).get(inn=inn)
         except Organization.DoesNotExist:
             logger.error(f"Организация с ИНН {inn} не найдена")
             return Response(
@@ -139,3 +232,7 @@ class BalanceView(APIView):
                 {"error": "Внутренняя ошибка сервера"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+        data = {"inn": inn, "balance": str(from_kopecks(balance_kopecks))}
+        cache_balance(inn, data)
+        return Response(data, status=status.HTTP_200_OK)